@@ -6,8 +6,13 @@ from typing import List, Optional
 from app.db.models import Character, CharacterStatus, User
 from app.db.db import get_async_session
 from app.services.character_service import CharacterService
-from app.schemas.characters import CharacterInput, CharacterResponse
+from app.schemas.characters import (
+    CharacterBatchGenerateInput,
+    CharacterInput,
+    CharacterResponse,
+)
 from app.users.user import active_user, fastapi_users
+from app.utils.openai_client import ensure_openai_available
 
 router = APIRouter()
 
@@ -27,7 +32,32 @@ async def create_character(
         )
 
 
-@router.post("/{character_id}/generate", response_model=CharacterResponse)
+@router.post(
+    "/generate",
+    response_model=List[CharacterResponse],
+    dependencies=[Depends(ensure_openai_available)],
+)
+async def generate_characters(
+    data: CharacterBatchGenerateInput,
+    db: AsyncSession = Depends(get_async_session),
+    user: User = Depends(active_user),
+):
+    """Generate or regenerate characters, one OpenAI request per chunk."""
+    try:
+        return await CharacterService.generate_characters(data.character_ids, db, user)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/{character_id}/generate",
+    response_model=CharacterResponse,
+    dependencies=[Depends(ensure_openai_available)],
+)
 async def generate_character(
     character_id: str,
     db: AsyncSession = Depends(get_async_session),
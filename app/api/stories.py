@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.db.models import StoryStatus, User
@@ -12,6 +13,7 @@ from app.schemas.stories import (
 )
 from app.services.story_service import StoryService
 from app.users.user import active_user
+from app.utils.openai_client import ensure_openai_available
 
 router = APIRouter()
 
@@ -68,7 +70,11 @@ async def get_story(
         raise HTTPException(status_code=500, detail=f"Failed to get story: {str(e)}")
 
 
-@router.post("/{story_id}/refine", response_model=StoryResponse)
+@router.post(
+    "/{story_id}/refine",
+    response_model=StoryResponse,
+    dependencies=[Depends(ensure_openai_available)],
+)
 async def refine_story_details(
     story_id: str,
     db: AsyncSession = Depends(get_async_session),
@@ -107,7 +113,11 @@ async def delete_story(
         raise HTTPException(status_code=500, detail=f"Failed to delete story: {str(e)}")
 
 
-@router.post("/{story_id}/content", response_model=StoryResponse)
+@router.post(
+    "/{story_id}/content",
+    response_model=StoryResponse,
+    dependencies=[Depends(ensure_openai_available)],
+)
 async def create_story_content(
     story_id: str,
     db: AsyncSession = Depends(get_async_session),
@@ -122,7 +132,24 @@ async def create_story_content(
         )
 
 
-@router.post("/{story_id}/cover_image", response_model=ImageResponse)
+@router.post(
+    "/{story_id}/content/stream", dependencies=[Depends(ensure_openai_available)]
+)
+async def stream_story_content(
+    story_id: str,
+    db: AsyncSession = Depends(get_async_session),
+    user: User = Depends(active_user),
+):
+    """Generate the content of a story, streamed as server-sent events."""
+    events = await StoryService.stream_story_content(story_id, user, db)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
+@router.post(
+    "/{story_id}/cover_image",
+    response_model=ImageResponse,
+    dependencies=[Depends(ensure_openai_available)],
+)
 async def create_story_cover_image(
     story_id: str,
     db: AsyncSession = Depends(get_async_session),
@@ -10,6 +10,11 @@ class Settings(BaseSettings):
     APP_NAME: str = "GenStoryAI"
     DATABASE_URL: str = os.getenv("DATABASE_URL")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    # Chat model used for all generations, e.g. a fine-tuned gpt-4o-mini.
+    OPENAI_CHAT_MODEL: str = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+    # Account rate limit and cap on concurrent requests to OpenAI.
+    OPENAI_REQUESTS_PER_MINUTE: int = os.getenv("OPENAI_REQUESTS_PER_MINUTE", 3500)
+    OPENAI_MAX_INFLIGHT: int = os.getenv("OPENAI_MAX_INFLIGHT", 50)
     SECRET_KEY: str = os.getenv("SECRET_KEY")
 
     class Config:
@@ -1,8 +1,58 @@
-from fastapi import Depends, FastAPI
+import logging
+import queue
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from app.api import auth, characters, stories, users
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.openai_client import cache_stats, close_clients
+
+logger = logging.getLogger(__name__)
+
+# Log records are handed to a queue and written to stderr from a background
+# thread, so logging never blocks the event loop on I/O.
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = QueueListener(_log_queue, _log_handler)
+_queue_handler = QueueHandler(_log_queue)
+# QueueHandler.prepare renders the message and any traceback on the logging
+# thread; the listener's handler then adds the level and logger name. Without
+# this, basicConfig would give the queue handler BASIC_FORMAT as well and
+# every line would carry the "LEVEL:name:" prefix twice.
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+# The engine's echo=True already prints SQL through SQLAlchemy's own handler;
+# letting those records reach the root handler as well prints them twice.
+logging.getLogger("sqlalchemy.engine").propagate = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _log_listener.start()
+    try:
+        yield
+        logger.info("OpenAI response cache stats: %s", cache_stats())
+        await close_clients()
+    finally:
+        # Flush queued records even if closing the clients fails.
+        _log_listener.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Tell clients to back off while OpenAI calls are short-circuited."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
-app = FastAPI()
 
 app.include_router(characters.router, prefix="/characters", tags=["characters"])
 app.include_router(stories.router, prefix="/stories", tags=["stories"])
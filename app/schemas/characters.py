@@ -10,6 +10,10 @@ class CharacterInput(BaseModel):
     traits: Optional[List[Trait]]
 
 
+class CharacterBatchGenerateInput(BaseModel):
+    character_ids: List[str] = Field(..., min_length=1, max_length=20)
+
+
 class CharacterResponse(BaseModel):
     id: str
     name: Optional[str]
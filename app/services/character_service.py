@@ -3,9 +3,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException, status
 from uuid import uuid4
+from typing import List
+
 from app.db.models import Character, CharacterStatus, User
 from app.schemas.characters import CharacterInput
-from app.utils.openai_client import generate_character_with_openai
+from app.utils.openai_client import (
+    EnhancedCharacter,
+    generate_character_with_openai,
+    generate_characters_bulk,
+)
 
 
 class CharacterService:
@@ -60,16 +66,12 @@ class CharacterService:
                     detail="Character must be in draft or generated status.",
                 )
 
-            generated_data = await generate_character_with_openai(character)
-
-            character.optimized_name = generated_data["optimized_name"]
-            character.optimized_description = generated_data["optimized_description"]
-            character.optimized_traits = generated_data["optimized_traits"]
-            character.optimized_story_context = generated_data[
-                "optimized_story_context"
-            ]
-            character.status = CharacterStatus.generated
-            character.updated_at = datetime.now(timezone.utc)
+            # Asking again for an already generated character is an explicit
+            # regenerate, so it must not be answered from the response cache.
+            generated_data = await generate_character_with_openai(
+                character, use_cache=character.status == CharacterStatus.draft
+            )
+            CharacterService._apply_enhancement(character, generated_data)
 
             await db.commit()
             await db.refresh(character)
@@ -82,6 +84,62 @@ class CharacterService:
                 detail=f"Failed to generate character: {str(e)}",
             )
 
+    @staticmethod
+    async def generate_characters(
+        character_ids: List[str], db: AsyncSession, user: User
+    ):
+        """Generate or regenerate characters, one OpenAI request per chunk."""
+        try:
+            query = select(Character).where(
+                Character.id.in_(character_ids), Character.user_id == user.id
+            )
+            result = await db.execute(query)
+            characters = result.scalars().all()
+
+            if len(characters) != len(set(character_ids)):
+                raise HTTPException(status_code=404, detail="Character not found")
+            if any(
+                character.status
+                not in {CharacterStatus.draft, CharacterStatus.generated}
+                for character in characters
+            ):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Character must be in draft or generated status.",
+                )
+
+            generated = await generate_characters_bulk(
+                characters,
+                use_cache=all(
+                    character.status == CharacterStatus.draft
+                    for character in characters
+                ),
+            )
+            for character, generated_data in zip(characters, generated):
+                CharacterService._apply_enhancement(character, generated_data)
+
+            await db.commit()
+            return [character.to_response() for character in characters]
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to generate characters: {str(e)}",
+            )
+
+    @staticmethod
+    def _apply_enhancement(character: Character, generated_data: EnhancedCharacter):
+        """Copy an OpenAI enhancement onto a character and mark it generated."""
+        character.optimized_name = generated_data.optimized_name
+        character.optimized_description = generated_data.optimized_description
+        character.optimized_traits = [
+            trait.model_dump() for trait in generated_data.optimized_traits
+        ]
+        character.optimized_story_context = generated_data.optimized_story_context
+        character.status = CharacterStatus.generated
+        character.updated_at = datetime.now(timezone.utc)
+
     @staticmethod
     async def update_character(
         character_id: str, data: CharacterInput, db: AsyncSession, user: User
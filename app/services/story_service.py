@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import os
 from pathlib import Path
@@ -5,19 +6,24 @@ import uuid
 import aiohttp
 
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
+from app.db.db import async_session_maker
 from app.db.models import Character, CharacterStatus, Image, Story, StoryStatus, User
 from fastapi import HTTPException
 from uuid import uuid4
 from datetime import datetime, timezone
+from typing import AsyncIterator
 
 from app.schemas.stories import StoryBasicUpdate, StoryInput
+from app.utils.json_utils import dumps
 from app.utils.openai_client import (
     FullStoryDetails,
     generate_cover_image,
     generate_cover_image_prompt,
     generate_story_content,
     generate_story_details_with_openai,
+    stream_story_content as stream_generated_story_content,
 )
 
 
@@ -114,15 +120,19 @@ class StoryService:
             raise HTTPException(status_code=400, detail="Invalid character IDs.")
 
         try:
-            response = await generate_story_details_with_openai(story, characters)
+            # Refining an already refined story is an explicit regenerate, so
+            # it must not be answered from the response cache.
+            response = await generate_story_details_with_openai(
+                story, characters, use_cache=story.status == StoryStatus.draft
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error refining story details: {e}"
             )
 
-        story.optimized_title = response["optimized_title"]
-        story.optimized_description = response["optimized_description"]
-        story.character_roles = response["character_roles"]
+        story.optimized_title = response.optimized_title
+        story.optimized_description = response.optimized_description
+        story.character_roles = [role.model_dump() for role in response.character_roles]
         story.status = "generated"
         story.updated_at = datetime.now()
 
@@ -192,9 +202,16 @@ class StoryService:
         if not story:
             raise HTTPException(status_code=404, detail="Story not found.")
 
-        content: FullStoryDetails = await generate_story_content(story)
+        try:
+            content: FullStoryDetails = await generate_story_content(
+                story, use_cache=not story.content
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error generating story content: {e}"
+            )
         # Update the content
-        story.content = content
+        story.content = content.model_dump()
         story.status = "finalized"
         story.updated_at = datetime.now()
         # Commit the changes
@@ -202,6 +219,54 @@ class StoryService:
         await db.refresh(story)
         return story.to_response()
 
+    @staticmethod
+    async def stream_story_content(
+        story_id: str, user: User, db: AsyncSession
+    ) -> AsyncIterator[str]:
+        """Generate the content of a story as a stream of server-sent events.
+
+        The story is looked up before streaming starts so a missing story is
+        still a 404. Each event carries the content parsed so far; once the
+        stream completes the final content is saved like create_story_content.
+        """
+        query = select(Story).where(
+            Story.id == story_id,
+            Story.user_id == user.id,
+        )
+        result = await db.execute(query)
+        story = result.scalars().first()
+        if not story:
+            raise HTTPException(status_code=404, detail="Story not found.")
+
+        return StoryService._story_content_events(story)
+
+    @staticmethod
+    async def _story_content_events(story: Story) -> AsyncIterator[str]:
+        content = None
+        try:
+            async for content in stream_generated_story_content(
+                story, use_cache=not story.content
+            ):
+                yield f"data: {dumps(content)}\n\n"
+
+            # The request's session is closed by the time the body is streamed.
+            async with async_session_maker() as session:
+                await session.execute(
+                    update(Story)
+                    .where(Story.id == story.id)
+                    .values(
+                        content=content,
+                        status="finalized",
+                        updated_at=datetime.now(),
+                    )
+                )
+                await session.commit()
+        except Exception as e:
+            yield f"event: error\ndata: {dumps({'detail': str(e)})}\n\n"
+            return
+
+        yield "event: done\ndata: {}\n\n"
+
     @staticmethod
     async def create_story_cover_image(story_id: str, user: User, db: AsyncSession):
 
@@ -229,8 +294,8 @@ class StoryService:
 
         try:
             # Generate cover image
-            cover_image_prompt = generate_cover_image_prompt(story)
-            image_b64 = generate_cover_image(cover_image_prompt["prompt"])
+            cover_image_prompt = await generate_cover_image_prompt(story)
+            image_b64 = await generate_cover_image(cover_image_prompt.prompt)
 
             image = Image(
                 id=str(uuid.uuid4()),
@@ -296,8 +361,8 @@ class StoryService:
         file_path = downloads_path / filename
 
         try:
-            with open(file_path, "wb") as file:
-                file.write(image_data)
+            # A cover is a few MB; write it off the event loop.
+            await asyncio.to_thread(file_path.write_bytes, image_data)
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Failed to save the image: {e}"
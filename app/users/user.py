@@ -1,3 +1,4 @@
+import logging
 from typing import Optional
 from fastapi import Depends, Request, Response
 from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
@@ -12,30 +13,32 @@ from app.db.db import async_session_maker, engine, get_user_db
 from app.db.models import User
 from app.core.config import settings
 
-print(f"Loaded APP_NAME: {settings.APP_NAME}")
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = settings.SECRET_KEY
 
 class UserManager(UUIDIDMixin, BaseUserManager):
     reset_password_token_secret = SECRET_KEY
     verification_token_secret = SECRET_KEY
     async def on_after_register(self, user: User, request: Optional[Request] = None):
-        print(f"User {user.id} has registered.")
+        logger.info("User %s has registered.", user.id)
 
     async def on_after_verify(self, user: User, request: Optional[Request] = None):
-        print(f"User {user.id} has been verified.")
+        logger.info("User %s has been verified.", user.id)
 
     async def on_after_update(self, user: User, request: Optional[Request] = None):
-        print(f"User {user.id} has been updated.")
+        logger.info("User %s has been updated.", user.id)
 
     async def on_after_request_verify(
         self, user: User, token: str, request: Optional[Request] = None
     ):
-        print(f"Verification requested for user {user.id}. Verification token: {token}")
+        logger.info("Verification requested for user %s.", user.id)
+        logger.debug("Verification token for user %s: %s", user.id, token)
 
     async def on_after_reset_password(
         self, user: User, request: Optional[Request] = None
     ):
-        print(f"User {user.id} has reset their password.")
+        logger.info("User %s has reset their password.", user.id)
 
     async def on_after_login(
         self,
@@ -43,19 +46,19 @@ class UserManager(UUIDIDMixin, BaseUserManager):
         request: Request | None = None,
         response: Response | None = None,
     ) -> None:
-        print(f"User {user.id} has logged in.")
-        print(f"Request: {request.json()}")
-        print(f"Response: {response.body}")
+        logger.info("User %s has logged in.", user.id)
 
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
     ):
-        print(f"User {user.id} has forgot their password. Reset token: {token}")
+        logger.info("User %s has forgot their password.", user.id)
+        logger.debug("Reset token for user %s: %s", user.id, token)
 
     async def on_after_request_verify(
         self, user: User, token: str, request: Optional[Request] = None
     ):
-        print(f"Verification requested for user {user.id}. Verification token: {token}")
+        logger.info("Verification requested for user %s.", user.id)
+        logger.debug("Verification token for user %s: %s", user.id, token)
 
 
 async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db)):
@@ -0,0 +1,59 @@
+import math
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because the breaker is open.
+
+    retry_after is the number of whole seconds until calls go through again.
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fail fast after repeated consecutive failures of an upstream service.
+
+    Once failure_threshold consecutive failures are recorded the breaker
+    opens and every call is rejected until reset_timeout seconds have passed.
+    After that, calls go through again; one more failure reopens it and a
+    success closes it.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return (
+            self.failures >= self.failure_threshold
+            and time.monotonic() - self.opened_at < self.reset_timeout
+        )
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if calls are currently being rejected."""
+        if self.is_open:
+            retry_after = math.ceil(
+                self.reset_timeout - (time.monotonic() - self.opened_at)
+            )
+            raise CircuitOpenError(
+                f"{self.name} is unavailable after {self.failures} consecutive "
+                f"failures; retry in {retry_after}s.",
+                retry_after=retry_after,
+            )
+
+    def record_success(self) -> None:
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
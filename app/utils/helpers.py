@@ -1,17 +1,16 @@
 from datetime import datetime, timezone
 from uuid import uuid4
 
+_UTC = timezone.utc
+
 def generate_uuid() -> str:
-    """Generate a UUID as a string."""
-    return str(uuid4())
+    """Generate a UUID4 as a 32-character hex string (no dashes)."""
+    return uuid4().hex
 
 def get_current_utc_time() -> datetime:
     """Get the current UTC time."""
-    return datetime.now(timezone.utc)
+    return datetime.now(_UTC)
 
 def serialize_json_field(json_field):
     """Safely serialize a JSON field from a database."""
-    try:
-        return json_field if json_field else {}
-    except Exception as e:
-        raise ValueError(f"Error serializing JSON field: {e}")
\ No newline at end of file
+    return json_field or {}
\ No newline at end of file
@@ -0,0 +1,27 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+
+def dumps_bytes(value: Any, sort_keys: bool = False) -> bytes:
+    """Encode a value as UTF-8 JSON, using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(value, option=option)
+    return json.dumps(value, ensure_ascii=False, sort_keys=sort_keys).encode("utf-8")
+
+
+def dumps(value: Any, sort_keys: bool = False) -> str:
+    """Encode a value as a JSON string, using orjson when it is installed."""
+    return dumps_bytes(value, sort_keys=sort_keys).decode("utf-8")
+
+
+def loads(value: str | bytes) -> Any:
+    """Decode JSON text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
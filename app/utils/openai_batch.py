@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from app.db.models import Character
+from app.utils.json_utils import dumps_bytes, loads
+from app.utils.openai_client import (
+    CHARACTER_SYSTEM_PROMPT,
+    MAX_COMPLETION_TOKENS,
+    OPENAI_CHAT_MODEL,
+    RESPONSE_FORMATS,
+    EnhancedCharacter,
+    call_with_retry,
+    chat_messages,
+    get_openai_client,
+    structured_char_prompt,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _character_batch_line(character: Character) -> bytes:
+    return dumps_bytes(
+        {
+            "custom_id": str(character.id),
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": OPENAI_CHAT_MODEL,
+                "messages": chat_messages(
+                    CHARACTER_SYSTEM_PROMPT, structured_char_prompt(character)
+                ),
+                "response_format": RESPONSE_FORMATS[EnhancedCharacter],
+                "max_completion_tokens": MAX_COMPLETION_TOKENS[EnhancedCharacter],
+            },
+        }
+    )
+
+
+async def submit_character_batch(characters: List[Character]) -> str:
+    """Submit character enhancements to the OpenAI Batch API.
+
+    Batches are billed at half price and complete within 24 hours, so this is
+    meant for bulk jobs; callers that need the result now should use
+    generate_character_with_openai instead. Returns the batch id.
+    """
+    client = get_openai_client()
+
+    payload = b"\n".join(_character_batch_line(c) for c in characters) + b"\n"
+    input_file = await call_with_retry(
+        client.files.create,
+        file=("characters.jsonl", payload),
+        purpose="batch",
+    )
+    batch = await call_with_retry(
+        client.batches.create,
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+    )
+
+    logger.info("Submitted %d characters as batch %s", len(characters), batch.id)
+    return batch.id
+
+
+async def poll_batch(batch_id: str) -> Dict[str, EnhancedCharacter] | None:
+    """Return the enhanced characters of a finished batch keyed by Character.id.
+
+    Returns None while the batch is still running. Lines that failed or were
+    refused are logged and left out of the result.
+    """
+    client = get_openai_client()
+
+    batch = await call_with_retry(client.batches.retrieve, batch_id)
+    if batch.status not in BATCH_TERMINAL_STATUSES:
+        return None
+    if batch.status != "completed":
+        raise ValueError(f"OpenAI batch {batch_id} ended as {batch.status}")
+    if not batch.output_file_id:
+        return {}
+
+    output = await call_with_retry(client.files.content, batch.output_file_id)
+
+    results: Dict[str, EnhancedCharacter] = {}
+    for line in output.text.splitlines():
+        if not line:
+            continue
+        item = loads(line)
+        custom_id = item["custom_id"]
+        try:
+            message = item["response"]["body"]["choices"][0]["message"]
+            results[custom_id] = EnhancedCharacter.model_validate_json(
+                message["content"]
+            )
+        except (KeyError, IndexError, TypeError, ValueError):
+            logger.warning(
+                "Batch %s: no usable result for character %s: %s",
+                batch_id,
+                custom_id,
+                item.get("error"),
+            )
+    return results
+
+
+async def wait_for_batch(
+    batch_id: str, initial_interval: float = 30.0, max_interval: float = 600.0
+) -> Dict[str, EnhancedCharacter]:
+    """Poll a batch with exponential backoff until it finishes."""
+    interval = initial_interval
+    while True:
+        results = await poll_batch(batch_id)
+        if results is not None:
+            return results
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, max_interval)
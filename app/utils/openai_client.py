@@ -1,23 +1,220 @@
+import asyncio
+import base64
+import hashlib
 import json
-import os
-from typing import Any, Coroutine, List, Optional, Dict
-
-from dotenv import load_dotenv
-from openai import OpenAI
-
-from openai.resources.chat.completions import ChatCompletion
+import logging
+import random
+from contextlib import asynccontextmanager
+from operator import attrgetter
+from string import Template
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI, AsyncStream
+from openai.lib._parsing import type_to_response_format_param
 from openai.resources.images import ImagesResponse
-
-from openai.resources.beta.chat.completions import ParsedChatCompletion
+from openai.types.chat import ChatCompletionChunk
 from pydantic import BaseModel
-from sqlalchemy import Sequence
-from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic_core import from_json
+
 from app.core.config import settings
 from app.db.models import Character, Story
 from app.schemas.traits import Trait
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.json_utils import dumps, dumps_bytes
+from app.utils.rate_limiter import RateLimiter
+from app.utils.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_client: AsyncOpenAI | None = None
+_download_client: httpx.AsyncClient | None = None
+
+# Retry policy for transient OpenAI failures (rate limits, timeouts, 5xx).
+OPENAI_MAX_ATTEMPTS = 5
+OPENAI_RETRY_BASE_DELAY = 1.0
+OPENAI_RETRY_MAX_DELAY = 16.0
+RETRYABLE_OPENAI_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Client-side request budget, kept at 95% of the account's requests-per-minute
+# limit so bursts are smoothed out locally instead of bouncing off 429s, and
+# a cap on concurrent requests so bulk fan-out cannot exhaust the pool.
+_rate_limiter = RateLimiter(
+    settings.OPENAI_REQUESTS_PER_MINUTE * 0.95, time_period=60.0
+)
+_inflight_requests = asyncio.Semaphore(settings.OPENAI_MAX_INFLIGHT)
+
+# Stop calling OpenAI for a cool-down period once transient failures keep
+# exhausting their retries, instead of waiting out every retry cycle.
+_breaker = CircuitBreaker("OpenAI", failure_threshold=5, reset_timeout=30.0)
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Return the shared OpenAI client, creating it on first use.
+
+    Reusing one client keeps its HTTP connection pool (and TLS sessions)
+    alive across requests instead of rebuilding it on every call.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            # Retries are handled by call_with_retry.
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=50, max_connections=100)
+            ),
+        )
+    return _client
+
+
+def ensure_openai_available() -> None:
+    """Raise CircuitOpenError while OpenAI calls are being short-circuited.
+
+    Used as a route dependency so OpenAI-backed endpoints fail fast with a
+    503 before doing any work, including before a streamed response starts.
+    """
+    _breaker.before_call()
+
+
+def get_download_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client used to fetch generated images."""
+    global _download_client
+    if _download_client is None:
+        _download_client = httpx.AsyncClient(timeout=60, follow_redirects=True)
+    return _download_client
+
+
+async def close_clients() -> None:
+    """Close the shared HTTP clients; called on application shutdown."""
+    global _client, _download_client
+    if _client is not None:
+        await _client.close()
+        _client = None
+    if _download_client is not None:
+        await _download_client.aclose()
+        _download_client = None
+
 
+async def fetch_cover_bytes(url: str) -> bytes:
+    """Download a generated cover image."""
+    response = await get_download_client().get(url)
+    response.raise_for_status()
+    return response.content
 
-load_dotenv()
+
+def _retry_after(error: Exception) -> float:
+    """Return the server's requested Retry-After delay in seconds, or 0."""
+    if not isinstance(error, openai.APIStatusError):
+        return 0.0
+    try:
+        delay = float(error.response.headers.get("retry-after", 0))
+    except ValueError:
+        return 0.0
+    return min(delay, OPENAI_RETRY_MAX_DELAY)
+
+
+async def call_with_retry(
+    func: Callable[..., Awaitable[Any]],
+    /,
+    *args,
+    limit_inflight: bool = True,
+    **kwargs,
+) -> Any:
+    """Await an OpenAI SDK call.
+
+    Transient errors are retried with jittered exponential backoff (1s, 2s,
+    4s, ... capped at OPENAI_RETRY_MAX_DELAY), waiting at least as long as
+    a Retry-After header asks; any other error is raised immediately. Every
+    attempt first waits for the rate limiter and a free in-flight slot; the
+    slot is released before any backoff sleep. Callers that must hold the
+    slot beyond the call, like _open_chat_stream, pass limit_inflight=False
+    and take it themselves. Raises CircuitOpenError without calling OpenAI
+    while the breaker is open.
+    """
+    _breaker.before_call()
+    for attempt in range(1, OPENAI_MAX_ATTEMPTS + 1):
+        await _rate_limiter.acquire()
+        try:
+            if limit_inflight:
+                async with _inflight_requests:
+                    result = await func(*args, **kwargs)
+            else:
+                result = await func(*args, **kwargs)
+        except RETRYABLE_OPENAI_ERRORS as e:
+            if attempt == OPENAI_MAX_ATTEMPTS:
+                _breaker.record_failure()
+                raise
+            delay = min(
+                OPENAI_RETRY_BASE_DELAY * 2 ** (attempt - 1), OPENAI_RETRY_MAX_DELAY
+            )
+            delay += random.uniform(0, OPENAI_RETRY_BASE_DELAY)
+            delay = max(delay, _retry_after(e))
+            logger.warning(
+                "Transient OpenAI error (attempt %d/%d), retrying in %.1fs: %s",
+                attempt,
+                OPENAI_MAX_ATTEMPTS,
+                delay,
+                e,
+            )
+            await asyncio.sleep(delay)
+        else:
+            _breaker.record_success()
+            return result
+
+
+@asynccontextmanager
+async def _open_chat_stream(
+    **kwargs,
+) -> AsyncIterator[AsyncStream[ChatCompletionChunk]]:
+    """Open a streamed chat completion and close it on exit.
+
+    The stream keeps an in-flight slot until it is closed, so long-running
+    streams count against OPENAI_MAX_INFLIGHT and their pooled connection is
+    returned even when the consumer stops early or raises.
+    """
+    client = get_openai_client()
+
+    async def create_stream() -> AsyncStream[ChatCompletionChunk]:
+        await _inflight_requests.acquire()
+        try:
+            return await client.chat.completions.create(stream=True, **kwargs)
+        except BaseException:
+            _inflight_requests.release()
+            raise
+
+    stream = await call_with_retry(create_stream, limit_inflight=False)
+    try:
+        async with stream:
+            yield stream
+    finally:
+        _inflight_requests.release()
+
+
+OPENAI_CHAT_MODEL = settings.OPENAI_CHAT_MODEL
+
+# Characters enhanced per request by generate_characters_bulk.
+CHARACTER_BULK_CHUNK_SIZE = 20
+
+# Exact-match cache of parsed chat completions, keyed on model, response
+# schema and prompt inputs.
+RESPONSE_CACHE_MAX_SIZE = 1000
+RESPONSE_CACHE_TTL_SECONDS = 86400
+_response_cache = ResponseCache(
+    maxsize=RESPONSE_CACHE_MAX_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS
+)
+# Completions currently being requested, keyed like the response cache, so
+# identical concurrent requests await the same OpenAI call.
+_inflight: Dict[str, "asyncio.Future[Any]"] = {}
 
 
 class Skill(BaseModel):
@@ -79,10 +276,44 @@ class EnhancedCharacter(BaseModel):
     optimized_story_context: str
 
 
+class NumberedEnhancedCharacter(BaseModel):
+    character_number: int  # The N of the "### Character N" heading
+    character: EnhancedCharacter
+
+
+class EnhancedCharacters(BaseModel):
+    items: List[NumberedEnhancedCharacter]
+
+
 class CoverImagePrompt(BaseModel):
     prompt: str
 
 
+# Strict json_schema response formats, generated once at import instead of
+# on every request so the schema sent to OpenAI is also byte-identical.
+RESPONSE_FORMATS = {
+    model: type_to_response_format_param(model)
+    for model in (
+        EnhancedCharacter,
+        EnhancedCharacters,
+        EnhancedStoryDetails,
+        FullStoryDetails,
+        CoverImagePrompt,
+    )
+}
+
+
+# Output token ceilings per response format, with headroom over typical
+# replies, so a runaway generation is cut off instead of billed in full.
+MAX_COMPLETION_TOKENS = {
+    EnhancedCharacter: 1024,
+    EnhancedCharacters: 16384,
+    EnhancedStoryDetails: 2048,
+    FullStoryDetails: 4096,
+    CoverImagePrompt: 512,
+}
+
+
 class CharacterUpdateInput(BaseModel):
     description: str | None = None
     name: str | None = None
@@ -93,294 +324,474 @@ class CharacterUpdateInput(BaseModel):
         return f"{self.description} {self.name} {self.generated_traits} {self.story_context}"
 
 
-async def generate_character_with_openai(character_data: Character) -> Dict[str, Any]:
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
-    prompt = structured_char_prompt(character_data)
-
-    try:
+def cache_stats() -> Dict[str, int]:
+    """Return hit/miss counters and size of the OpenAI response cache."""
+    return _response_cache.stats()
 
-        response = client.beta.chat.completions.parse(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a creative AI assistant specialized in storytelling and character creation for children's stories.",
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-            response_format=EnhancedCharacter,
-            # This is an example; adjust based on actual API requirements
-            model="gpt-4o-mini",
-        )
 
-        if not response.choices:
-            raise ValueError("No choices found Open Ai response")
+def _response_cache_key(response_format: type[BaseModel], *inputs: Any) -> str:
+    """Build a cache key from the model, response schema and prompt inputs.
 
-        result = response.choices[0].message.content
-        parsed_response = json.loads(result)
+    The system prompts are module constants, so the schema name identifies
+    them and they are left out of the hashed payload.
+    """
+    key_source = dumps_bytes(
+        [OPENAI_CHAT_MODEL, response_format.__name__, *inputs], sort_keys=True
+    )
+    return hashlib.sha256(key_source).hexdigest()
+
+
+def chat_messages(system_prompt: str, prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": system_prompt,
+        },
+        {
+            "role": "user",
+            "content": prompt,
+        },
+    ]
+
+
+async def _parse_chat_completion(
+    system_prompt: str, prompt: str, response_format: type[ModelT]
+) -> ModelT:
+    """Request a structured chat completion parsed into response_format."""
+    client = get_openai_client()
+
+    response = await call_with_retry(
+        client.chat.completions.create,
+        messages=chat_messages(system_prompt, prompt),
+        response_format=RESPONSE_FORMATS[response_format],
+        max_completion_tokens=MAX_COMPLETION_TOKENS[response_format],
+        model=OPENAI_CHAT_MODEL,
+    )
 
-        return parsed_response
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
+    if not response.choices:
+        raise ValueError("No choices found Open Ai response")
 
+    logger.debug("OpenAI response id=%s", response.id)
 
-async def generate_story_details_with_openai(
-    story: Story, characters: List[Character]
-) -> dict:
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        raise ValueError("OpenAI response was cut off at max_completion_tokens")
+    message = choice.message
+    if message.refusal or not message.content:
+        raise ValueError(f"OpenAI response was not parsed: {message.refusal}")
+    return response_format.model_validate_json(message.content)
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-    prompt = story_details_prompt(characters, story)
+def _track_inflight(key: str, task: "asyncio.Future[Any]") -> None:
+    """Register task under key in _inflight until it finishes."""
+    _inflight[key] = task
 
-    try:
-
-        response = client.beta.chat.completions.parse(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a creative AI assistant specialized in storytelling and character creation for children's stories.",
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-            response_format=EnhancedStoryDetails,
-            # This is an example; adjust based on actual API requirements
-            model="gpt-4o-mini",
-        )
+    def forget(finished: "asyncio.Future[Any]") -> None:
+        if _inflight.get(key) is finished:
+            del _inflight[key]
+        if not finished.cancelled():
+            # Mark the exception as retrieved in case every caller has left.
+            finished.exception()
 
-        if not response.choices:
-            raise ValueError("No choices found Open Ai response")
+    task.add_done_callback(forget)
 
-        result = response.choices[0].message.content
-        parsed_response = json.loads(result)
 
-        return parsed_response
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {}
+async def _single_flight(key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+    """Run func once per key; concurrent callers with the same key share it.
 
+    The call runs as its own task and every caller awaits it through
+    asyncio.shield, so a caller that is cancelled only stops waiting; the
+    shared call and the other callers are unaffected.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(func())
+        _track_inflight(key, task)
+    return await asyncio.shield(task)
+
+
+async def _request_completion(
+    cache_key: str,
+    system_prompt: str,
+    prompt: str,
+    response_format: type[ModelT],
+) -> ModelT:
+    """Call OpenAI on a cache miss and cache the parsed result."""
+    parsed_response = await _parse_chat_completion(
+        system_prompt, prompt, response_format
+    )
+    _response_cache.set(cache_key, parsed_response)
+    return parsed_response
 
-async def generate_story_content(story: Story) -> EnhancedStory:
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    prompt = story_content_prompt(story)
+async def _cached_completion(
+    cache_key: str,
+    system_prompt: str,
+    build_prompt: Callable[[], str],
+    response_format: type[ModelT],
+    use_cache: bool,
+) -> ModelT:
+    """Serve a completion from the response cache or request it.
 
-    try:
-
-        response: ChatCompletion = client.beta.chat.completions.parse(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a creative AI assistant specialized in storytelling and character creation for children's stories.",
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-            response_format=FullStoryDetails,
-            # This is an example; adjust based on actual API requirements
-            model="gpt-4o-mini",
+    Completions are sampled, so an explicit regenerate passes use_cache=False
+    to skip the lookup; the fresh result then replaces the cached one.
+    """
+    if not use_cache:
+        return await _request_completion(
+            cache_key, system_prompt, build_prompt(), response_format
         )
 
-        if not response.choices:
-            raise ValueError("No choices found Open Ai response")
-
-        result = response.choices[0].message.content
-        parsed_response = json.loads(result)
+    cached = _response_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-        return parsed_response
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {}
-
-
-def generate_cover_image_prompt(story: Story) -> str:
-
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return await _single_flight(
+        cache_key,
+        lambda: _request_completion(
+            cache_key, system_prompt, build_prompt(), response_format
+        ),
+    )
 
-    # Narrative-style meta-prompt
-    meta_prompt_narrative = f"""
-Using the following full story as input, craft a vivid, narrative-style prompt for an AI image generator to create a magical, storybook-like cover illustration.
 
+def _character_cache_key(character_data: Character) -> str:
+    # Keyed on the raw fields rather than the rendered prompt, so a cache hit
+    # never pays for building the prompt.
+    return _response_cache_key(
+        EnhancedCharacter,
+        character_data.character_name,
+        character_data.character_description,
+        character_data.character_traits,
+        character_data.character_story_context,
+    )
 
 
-Full Story:
-{story.content["full_story"]}
+async def generate_character_with_openai(
+    character_data: Character, use_cache: bool = True
+) -> EnhancedCharacter:
+    return await _cached_completion(
+        _character_cache_key(character_data),
+        CHARACTER_SYSTEM_PROMPT,
+        lambda: structured_char_prompt(character_data),
+        EnhancedCharacter,
+        use_cache,
+    )
 
-Focus on depicting a single, climactic moment that captures the heart of the story. Your description should vividly bring the scene to life, incorporating:
 
-The illustration should capture a single, climactic moment that conveys the heart of the story, bringing it to life with rich, imaginative details. Focus on creating an image that appeals to child and evokes a sense of wonder and adventure.
+async def _generate_character_chunk(
+    characters: List[Character], cache_keys: List[str]
+) -> List[EnhancedCharacter]:
+    parsed_response = await _parse_chat_completion(
+        CHARACTER_BULK_SYSTEM_PROMPT,
+        bulk_char_prompt(characters),
+        EnhancedCharacters,
+    )
+    # Match results by the echoed number rather than by position, so a
+    # reordered or merged reply can never attach one character's enhancement
+    # to another.
+    numbers = sorted(item.character_number for item in parsed_response.items)
+    if numbers != list(range(1, len(characters) + 1)):
+        raise ValueError(
+            f"Expected enhanced characters numbered 1-{len(characters)}, "
+            f"got {numbers}"
+        )
+    by_number = {
+        item.character_number: item.character for item in parsed_response.items
+    }
+    results = [by_number[number] for number in range(1, len(characters) + 1)]
+    for cache_key, result in zip(cache_keys, results):
+        _response_cache.set(cache_key, result)
+    return results
+
+
+async def _chunk_item(
+    chunk_task: "asyncio.Future[List[EnhancedCharacter]]", index: int
+) -> EnhancedCharacter:
+    return (await chunk_task)[index]
+
+
+async def generate_characters_bulk(
+    characters: List[Character], use_cache: bool = True
+) -> List[EnhancedCharacter]:
+    """Enhance several characters, preserving their order.
+
+    Uncached characters are sent CHARACTER_BULK_CHUNK_SIZE at a time in a
+    single request each, so the system prompt is paid once per chunk rather
+    than once per character. The chunks run concurrently as their own tasks,
+    and each character's result is registered in _inflight like a
+    _single_flight call, so other requests for a character already being
+    generated await it instead of requesting it again, and cancelling one
+    request leaves the shared work running. use_cache=False skips the cache
+    lookup, as in _cached_completion.
+    """
+    cache_keys = [_character_cache_key(character) for character in characters]
+    if use_cache:
+        results = [_response_cache.get(cache_key) for cache_key in cache_keys]
+    else:
+        results = [None] * len(characters)
+
+    missing = []
+    claimed = set()
+    for i, result in enumerate(results):
+        cache_key = cache_keys[i]
+        if result is None and cache_key not in _inflight and cache_key not in claimed:
+            claimed.add(cache_key)
+            missing.append(i)
+
+    for start in range(0, len(missing), CHARACTER_BULK_CHUNK_SIZE):
+        chunk = missing[start : start + CHARACTER_BULK_CHUNK_SIZE]
+        chunk_task = asyncio.ensure_future(
+            _generate_character_chunk(
+                [characters[i] for i in chunk], [cache_keys[i] for i in chunk]
+            )
+        )
+        for index, i in enumerate(chunk):
+            _track_inflight(
+                cache_keys[i], asyncio.ensure_future(_chunk_item(chunk_task, index))
+            )
+
+    waiting = [i for i, result in enumerate(results) if result is None]
+    generated = await asyncio.gather(
+        *(asyncio.shield(_inflight[cache_keys[i]]) for i in waiting)
+    )
+    for i, result in zip(waiting, generated):
+        results[i] = result
+    return results
 
-Include the following:
 
-Setting: Describe the environment in intricate detail, emphasizing magical or whimsical elements, atmospheric lighting, and textures that align with the story’s adventurous tone.
-Characters: Paint a vivid picture of the characters—their appearance, actions, and emotional expressions—highlighting their interaction and bond.
-Action or Dynamic Interaction: Show movement, dramatic tension, or an emotional highlight to bring the scene to life.
-Perspective and Composition: Suggest a dynamic composition, such as a close-up of the characters or a wide-angle that incorporates the environment and action.
-Themes and Symbolism: Reflect key themes, such as friendship, bravery, and discovery, with symbolic elements (e.g., a glowing tree as a beacon of guidance).
-Mood and Emotional Tone: Clearly capture the mood (e.g., adventurous, comforting, or triumphant) with specific lighting and color palettes.
-Art Style: Specify the desired art style, such as whimsical and cartoonish, soft watercolor, or a vibrant storybook aesthetic.
-Magical Enhancements: Incorporate fantastical elements, like glowing butterflies, shimmering leaves, or enchanted lighting effects, to amplify the magic.
-Scalability for Text: Ensure space is left for the story’s title and author name, if needed, without crowding the focal point.
-Output the description as a single, cohesive paragraph, using immersive, narrative-driven language that feels inspiring and guides the artist in visualizing the scene.
-"""
+async def generate_story_details_with_openai(
+    story: Story, characters: List[Character], use_cache: bool = True
+) -> EnhancedStoryDetails:
+    # Like the character cache, keyed on the raw fields so the character
+    # block is only rendered on a miss.
+    cache_key = _response_cache_key(
+        EnhancedStoryDetails,
+        story.title,
+        story.description,
+        [_story_details_character_fields(character) for character in characters],
+    )
+    return await _cached_completion(
+        cache_key,
+        STORY_DETAILS_SYSTEM_PROMPT,
+        lambda: story_details_prompt(characters, story),
+        EnhancedStoryDetails,
+        use_cache,
+    )
 
-    try:
 
-        response: ChatCompletion = client.beta.chat.completions.parse(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a creative assistant skilled in crafting vivid, narrative-style prompts for visual storytelling.",
-                },
-                {
-                    "role": "user",
-                    "content": meta_prompt_narrative,
-                },
-            ],
-            response_format=CoverImagePrompt,
-            # This is an example; adjust based on actual API requirements
-            model="gpt-4o-mini",
-        )
+async def generate_story_content(
+    story: Story, use_cache: bool = True
+) -> FullStoryDetails:
+    prompt = story_content_prompt(story)
+    return await _cached_completion(
+        _response_cache_key(FullStoryDetails, prompt),
+        STORY_CONTENT_SYSTEM_PROMPT,
+        lambda: prompt,
+        FullStoryDetails,
+        use_cache,
+    )
 
-        if not response.choices:
-            raise ValueError("No choices found Open Ai response")
 
-        result = response.choices[0].message.content
-        parsed_response = json.loads(result)
+async def stream_story_content(
+    story: Story, use_cache: bool = True
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the story content progressively while it is being generated.
 
-        return parsed_response
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {}
+    Each item is a partial FullStoryDetails dict parsed from the JSON received
+    so far; the last item is the complete, validated result.
+    """
+    prompt = story_content_prompt(story)
 
+    cache_key = _response_cache_key(FullStoryDetails, prompt)
+    cached = _response_cache.get(cache_key) if use_cache else None
+    if cached is not None:
+        yield cached.model_dump()
+        return
+
+    buffer = ""
+    snapshot = None
+    finish_reason = None
+    async with _open_chat_stream(
+        messages=chat_messages(STORY_CONTENT_SYSTEM_PROMPT, prompt),
+        response_format=RESPONSE_FORMATS[FullStoryDetails],
+        max_completion_tokens=MAX_COMPLETION_TOKENS[FullStoryDetails],
+        model=OPENAI_CHAT_MODEL,
+    ) as stream:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            delta = choice.delta
+            if delta.refusal:
+                raise ValueError(f"OpenAI response was not parsed: {delta.refusal}")
+            if not delta.content:
+                continue
+
+            buffer += delta.content
+            # Incomplete strings are dropped from partial parses, so the
+            # snapshot can only change once a closing quote arrives; skip
+            # re-parsing the whole buffer for every other chunk.
+            if '"' not in delta.content:
+                continue
+            partial = from_json(buffer, allow_partial=True)
+            if partial != snapshot:
+                snapshot = partial
+                yield partial
+
+    if finish_reason == "length":
+        raise ValueError("OpenAI response was cut off at max_completion_tokens")
+    result = FullStoryDetails.model_validate_json(buffer)
+    _response_cache.set(cache_key, result)
+    result_dict = result.model_dump()
+    if result_dict != snapshot:
+        yield result_dict
+
+
+async def generate_cover_image_prompt(
+    story: Story, use_cache: bool = True
+) -> CoverImagePrompt:
+    prompt = cover_image_meta_prompt(story)
+    return await _cached_completion(
+        _response_cache_key(CoverImagePrompt, prompt),
+        COVER_IMAGE_SYSTEM_PROMPT,
+        lambda: prompt,
+        CoverImagePrompt,
+        use_cache,
+    )
 
-def generate_cover_image(cover_image_prompt: str) -> str:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-    try:
-        response: ImagesResponse = client.images.generate(
-            model="dall-e-3",
-            prompt=cover_image_prompt,
-            size="1024x1024",
-            quality="hd",
-            style="vivid",
-            response_format="b64_json",
-            n=1,
-        )
+async def generate_cover_image(cover_image_prompt: str) -> str:
+    client = get_openai_client()
 
-        if not response.data:
-            raise ValueError("No data found in Open Ai response")
-        return response.data[0].b64_json
+    response: ImagesResponse = await call_with_retry(
+        client.images.generate,
+        model="dall-e-3",
+        prompt=cover_image_prompt,
+        size="1024x1024",
+        quality="hd",
+        style="vivid",
+        response_format="url",
+        n=1,
+    )
 
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
+    if not response.data:
+        raise ValueError("No data found in Open Ai response")
+
+    # Images are stored base64-encoded, so encode once here rather than
+    # having OpenAI send a base64 payload ~33% larger than the PNG.
+    image_bytes = await fetch_cover_bytes(response.data[0].url)
+    return base64.b64encode(image_bytes).decode("ascii")
+
+
+CHARACTER_PROMPT_INSTRUCTIONS = {
+    "instructions": "Transform the basic character elements given by the user into vibrant, educational characters suitable for young readers. Follow the structured steps below and use the accompanying example to guide your enhancements.",
+    "example": {
+        "original": {
+            "name": "Mr. Whiskers",
+            "description": "A curious cat who loves adventures at sea.",
+            "traits": {
+                "curious": "Explores new waters",
+                "brave": "Faces any storm",
+                "sympathetic": "Helps stranded sailors",
+                "cunning": "Navigates by stars",
+                "resolute": "Seeks mythical lands",
+            },
+            "story_context": "Sets sail across the vast ocean.",
+        },
+        "enhanced": {
+            "name": "Captain Whiskerbeard",
+            "description": "The daring Captain Whiskerbeard, with a majestic beard and eye-patch, sails the candy-colored seas.",
+            "traits": {
+                "curious": "Discovers hidden underwater cities",
+                "brave": "Battles sea monsters courageously",
+                "sympathetic": "Rescues all sea creatures",
+                "cunning": "Outsmarts rival pirates",
+                "resolute": "Never veers off his quest for magical waters",
+            },
+            "story_context": "His journey through the Sugar Sea leads to candy cane islands and chocolate mountains.",
+        },
+    },
+    "tasks": [
+        {
+            "name_generation": {
+                "input": "Given Name",
+                "task": "Create a memorable and catchy name suitable for a child's hero.",
+                "reasoning": "A catchy name that is easy to remember and pronounce can greatly appeal to children and make the character more relatable.",
+            },
+        },
+        {
+            "description_enhancement": {
+                "input": "Given Description",
+                "task": "Enrich the description with vivid and engaging details.",
+                "reasoning": "Vivid descriptions capture a child's imagination, making the character more real and engaging.",
+            },
+        },
+        {
+            "traits_update": {
+                "input": "Given Traits",
+                "task": "Expand on each trait to show how they influence the character's adventures and interactions.",
+                "reasoning_steps": [
+                    "If there are no traits given, create 3 - 5 new ones based on the optimized description.",
+                ],
+            },
+        },
+        {
+            "story_context_enhancement": {
+                "input": "Given Story Context",
+                "task": "Craft a captivating setting that ignites a child's fantasy and sense of adventure.",
+                "reasoning": "An imaginative setting enhances the story's appeal and helps in delivering educational content in an entertaining way.",
+            },
+        },
+    ],
+    "final_output": {
+        "task": "Compile the refined character elements into the structured response format.",
+    },
+}
+
+# Rendered once from the dict above, so the embedded JSON is always valid.
+CHARACTER_SYSTEM_PROMPT = (
+    "You are a creative AI assistant specialized in storytelling and character creation for children's stories.\n\n"
+    + json.dumps(CHARACTER_PROMPT_INSTRUCTIONS, indent=2, ensure_ascii=False)
+    + "\n"
+)
+
+# Only the per-character data goes in the user message; everything static
+# lives in CHARACTER_SYSTEM_PROMPT so it forms a shared, cacheable prefix.
+STRUCTURED_CHAR_PROMPT_TEMPLATE = Template(
+    """Given Name: "$name"
+Given Description: "$description"
+Given Traits: "$traits"
+Given Story Context: "$story_context"
+"""
+)
 
 
 def structured_char_prompt(character_data: Character) -> str:
-    prompt = f"""
-{{
-  "instructions": "Transform the provided basic character elements into vibrant, educational characters suitable for young readers. Follow the structured steps below and use the accompanying example to guide your enhancements.",
-  "example": {{
-    "original": {{
-      "name": "Mr. Whiskers",
-      "description": "A curious cat who loves adventures at sea.",
-      "traits": {{
-        "curious": "Explores new waters",
-        "brave": "Faces any storm",
-        "sympathetic": "Helps stranded sailors",
-        "cunning": "Navigates by stars",
-        "resolute": "Seeks mythical lands"
-      }},
-      "story_context": "Sets sail across the vast ocean."
-    }},
-    "enhanced": {{
-      "name": "Captain Whiskerbeard",
-      "description": "The daring Captain Whiskerbeard, with a majestic beard and eye-patch, sails the candy-colored seas.",
-      "traits": {{
-        "curious": "Discovers hidden underwater cities",
-        "brave": "Battles sea monsters courageously",
-        "sympathetic": "Rescues all sea creatures",
-        "cunning": "Outsmarts rival pirates",
-        "resolute": "Never veers off his quest for magical waters"
-      }},
-      "story_context": "His journey through the Sugar Sea leads to candy cane islands and chocolate mountains."
-    }}
-  }},
-  "tasks": [
-    {{
-      "name_generation": {{
-        "given_name": "{character_data.character_name}",
-        "task": "Create a memorable and catchy name suitable for a child's hero.",
-        "reasoning": "A catchy name that is easy to remember and pronounce can greatly appeal to children and make the character more relatable."
-      }}
-    }},
-    {{
-      "description_enhancement": {{
-        "given_description": "{character_data.character_description}",
-        "task": "Enrich the description with vivid and engaging details.",
-        "reasoning": "Vivid descriptions capture a child's imagination, making the character more real and engaging."
-      }}
-    }},
-    {{
-      "traits_update": {{
-        "given_traits": "{character_data.character_traits}",
-        "task": "Expand on each trait to show how they influence the character's adventures and interactions. 
-        "reasoning_steps": [
-          If there are no traits given, create 3 - 5 new ones. base on the optimized description",
-        ]
-      }}
-    }},
-    {{
-      "story_context_enhancement": {{
-        "given_story_context": "{character_data.character_story_context}",
-        "task": "Craft a captivating setting that ignites a child's fantasy and sense of adventure.",
-        "reasoning": "An imaginative setting enhances the story's appeal and helps in delivering educational content in an entertaining way."
-      }}
-    }}
-  ],
-  "final_output": {{
-    "task": "Compile the refined character elements into a structured JSON object that can be easily understood and utilized.",
-    "example": {{
-      "optimized_name": "Suggested new name",
-      "optimized_description": "Colorful and engaging description for children",
-      "optimized_traits": {{
-        "curious": "Leads to educational adventures.",
-        "brave": "Demonstrates overcoming fears.",
-        "sympathetic": "Encourages empathy among young readers.",
-        "cunning": "Teaches problem-solving skills.",
-        "resolute": "Inspires persistence in pursuing dreams."
-      }},
-      "optimized_story_context": "Creates an engaging world that sparks imagination."
-    }}
-  }}
-}}
-"""
+    return STRUCTURED_CHAR_PROMPT_TEMPLATE.substitute(
+        name=character_data.character_name,
+        description=character_data.character_description,
+        traits=character_data.character_traits,
+        story_context=character_data.character_story_context,
+    )
 
-    return prompt
 
+CHARACTER_BULK_SYSTEM_PROMPT = (
+    CHARACTER_SYSTEM_PROMPT
+    + "\nThe user gives several numbered characters. Enhance each one "
+    'independently and return exactly one entry per character in "items", '
+    'setting "character_number" to the N of its "### Character N" '
+    "heading.\n"
+)
 
-def story_details_prompt(characters: List[Character], story: Story) -> str:
-    character_descriptions = "\n".join(
-        f"- Name: {c.character_name}, Description: {c.character_description}, Traits: {c.character_traits}, Story Context: {c.character_story_context}"
-        for c in characters
+
+def bulk_char_prompt(characters: List[Character]) -> str:
+    return "\n".join(
+        f"### Character {number}\n{structured_char_prompt(character)}"
+        for number, character in enumerate(characters, start=1)
     )
 
-    prompt = f"""
-You are a storytelling assistant specialized in creating engaging and educational narratives. Refine the following story details and provide enhancements in a structured JSON format.
 
-### Input Details
-- **Title**: "{story.title}"
-- **Description**: "{story.description}"
-- **Characters**:
-{character_descriptions}
+STORY_DETAILS_SYSTEM_PROMPT = """You are a storytelling assistant specialized in creating engaging and educational narratives. Refine the story details given by the user and provide enhancements in a structured JSON format.
 
 ### Output Requirements
 1. **Optimized Title**:
@@ -409,70 +820,135 @@ You are a storytelling assistant specialized in creating engaging and educationa
 
 ### Example Output
 ```json
-{{
+{
   "optimized_title": "The Enchanted Forest Quest",
   "optimized_description": "A magical journey through a vibrant forest where teamwork and bravery unlock hidden mysteries.",
   "character_roles": [
-    {{
+    {
       "name": "Lila",
       "role": "Protagonist",
       "enhanced_description": "Lila is a curious and brave young girl who embarks on a journey to save her village from a mysterious curse. Her determination and resourcefulness make her a natural leader.",
       "skills": [
-        {{"name": "Curiosity", "description": "Helps her discover hidden clues and magical pathways."}},
-        {{"name": "Bravery", "description": "Enables her to face challenges and overcome her fears."}}
+        {"name": "Curiosity", "description": "Helps her discover hidden clues and magical pathways."},
+        {"name": "Bravery", "description": "Enables her to face challenges and overcome her fears."}
       ],
       "motivations": "To lift the curse and protect her family and friends.",
       "flaws": "Her impulsive nature sometimes leads to risky decisions.",
       "interactions": "Lila forms a close bond with the forest creatures, who guide her on her journey. She learns to rely on her friends and appreciate teamwork."
-    }},
-    {{
+    },
+    {
       "name": "Elder Oak",
       "role": "Mentor",
       "enhanced_description": "A wise and ancient tree spirit who knows the secrets of the forest. Elder Oak provides guidance and imparts valuable lessons to Lila.",
       "skills": [
-        {{"name": "Wisdom", "description": "Provides insights to solve riddles and avoid danger."}},
-        {{"name": "Magic", "description": "Uses his powers to protect Lila when she is in danger."}}
+        {"name": "Wisdom", "description": "Provides insights to solve riddles and avoid danger."},
+        {"name": "Magic", "description": "Uses his powers to protect Lila when she is in danger."}
       ],
       "motivations": "To preserve the forest’s harmony and help Lila fulfill her destiny.",
       "flaws": "He speaks in riddles, which sometimes confuses Lila and slows her progress.",
       "interactions": "Elder Oak mentors Lila, helping her unlock her potential and teaching her the importance of patience and understanding."
-    }}
+    }
   ],
-  "reasoning": {{
+  "reasoning": {
     "title": "The refined title emphasizes the quest and mystery elements, making it more engaging for readers.",
     "description": "The enhanced description adds sensory details and emotional depth, capturing the reader's imagination.",
     "character_roles": "Each character’s role is clearly defined, making their contribution to the story cohesive and compelling."
-  }}
-}}"""
+  }
+}
+"""
 
-    return prompt
+STORY_DETAILS_PROMPT_TEMPLATE = Template(
+    """### Input Details
+- **Title**: "$title"
+- **Description**: "$description"
+- **Characters**:
+$characters
+"""
+)
+
+
+STORY_DETAILS_CHARACTER_LINE = (
+    "- Name: {}, Description: {}, Traits: {}, Story Context: {}"
+)
+_story_details_character_fields = attrgetter(
+    "character_name",
+    "character_description",
+    "character_traits",
+    "character_story_context",
+)
+
+
+def story_details_prompt(characters: List[Character], story: Story) -> str:
+    character_descriptions = "\n".join(
+        [
+            STORY_DETAILS_CHARACTER_LINE.format(
+                name, description, dumps(traits), story_context
+            )
+            for name, description, traits, story_context in map(
+                _story_details_character_fields, characters
+            )
+        ]
+    )
+
+    return STORY_DETAILS_PROMPT_TEMPLATE.substitute(
+        title=story.title,
+        description=story.description,
+        characters=character_descriptions,
+    )
+
+
+STORY_CONTENT_SYSTEM_PROMPT = """You are a famous children's book author and you are tasked with creating a middle story for a children's book. The story should be engaging, educational, and suitable for young readers. Write a complete story based on the title, description and characters given by the user.
+
+Here is a chain of thought process to guide you through the story development:
+Step 1: Introduce the main characters and describe their personalities and motivations in the magical setting.
+Step 2: Set up the magical world described in the story and hint at the mystery or challenge that the characters will face.
+Step 3: Introduce the conflict or obstacle that will drive the story forward, and highlight how the characters will need to work together to overcome it.
+Step 4: Develop the story by detailing the characters' journey, including the challenges they face, the lessons they learn, and the friendships they form.
+Step 5: Reach the climax of the story, where the characters face their greatest challenge and must use their skills and strengths to succeed.
+Step 6: Conclude the story by resolving the conflict, highlighting the characters' growth, the lessons they have learned and the rewards of their journey.
+
+The story should be imaginative, playful and suitable for children aged 6 - 10. Use vivid descriptions, engaging dialogue, and a child-friendly tone to captivate young readers. Ensure the story has a clear introduction, middle and resolution with lessons or morals that are relevant to the characters' journey.
+"""
+
+STORY_CONTENT_PROMPT_TEMPLATE = Template(
+    """### Title:
+$title
+
+### Description:
+$description
+
+### Characters:
+$characters
+"""
+)
 
 
 def story_content_prompt(story: Story) -> str:
+    return STORY_CONTENT_PROMPT_TEMPLATE.substitute(
+        title=story.title,
+        description=story.description,
+        characters=dumps(story.character_roles),
+    )
+
+
+COVER_IMAGE_SYSTEM_PROMPT = """You are a creative assistant skilled in crafting vivid, narrative-style prompts for visual storytelling.
+
+Using the full story given by the user, craft a prompt for an AI image generator to create a magical, storybook-like cover illustration. Depict a single, climactic moment that captures the heart of the story, with rich, imaginative details that appeal to children and evoke a sense of wonder and adventure.
+
+Include the following:
+- Setting: the environment in intricate detail, with magical or whimsical elements, atmospheric lighting, and textures that match the story’s adventurous tone.
+- Characters: their appearance, actions, and emotional expressions, highlighting their interaction and bond.
+- Action: movement, dramatic tension, or an emotional highlight.
+- Composition: a dynamic perspective, such as a close-up of the characters or a wide angle that includes the environment.
+- Themes and Symbolism: key themes such as friendship, bravery, and discovery, shown through symbolic elements (e.g., a glowing tree as a beacon of guidance).
+- Mood: the emotional tone (e.g., adventurous, comforting, or triumphant) through lighting and color palette.
+- Art Style: e.g., whimsical and cartoonish, soft watercolor, or a vibrant storybook aesthetic.
+- Magical Enhancements: fantastical touches like glowing butterflies, shimmering leaves, or enchanted lighting.
+- Space for Text: room for the story’s title and author name without crowding the focal point.
+
+Output the description as a single, cohesive paragraph of immersive, narrative-driven language that guides the artist in visualizing the scene.
+"""
 
-    thought_process = f"""
- Step 1: Introduce the main characters ({', '.join([c["name"] for c in story.character_roles])}) and describe tgeir personalities, motivations, to the magical setting.
- Step 2: Set up the magical world described in the story and hint at the mystery or challenge that the characters will face.
- Step 3: Introduce the conflit or obstacle that will drive the story forward, and highlight how the characters will need to work together to overcome it.
- Step 4 : Develop the story by detailing the characters' journey, including the challenges they face, the lessons they learn, and the friendships they form.
-  Step 5: Reach the climax of the story, where the characters face their greatest challenge and must use their skills and strengths to succeed.
-  Step 6: Conclude the story by resolving the conflict, highlighting the characters' growth and the lessons they have learned adn the rewards of their journey.
-    """
 
-    prompt = f"""
-    You are a famouse children's book author and you are tasked with creating a middle story for a children's book. The story should be engaging, educational, and suitable for young readers. Write a complete story titled "{story.title}" bassed on the following description and characters:
-    
-    ### Description:
-    {story.description}
-    
-    ### Characters:
-
-  {story.character_roles}  # Assuming character_roles is a list or description that explains each character's role.
-  
-  Here is a chain of thought process to guide you through the story development:
-  {thought_process}
-  
-  The story should be imaginative, playfule and suitable for children aged 6 - 10. Use vivid descriptions, engaging dialogue, and a child-friendly tone to captivate young readers. Ensure the story has a clear introduction, middle and resolution with lessons or morals that are relevant to the characters' journey.
-  """
-
-    return prompt
+def cover_image_meta_prompt(story: Story) -> str:
+    return f"### Full Story\n{story.content['full_story']}\n"
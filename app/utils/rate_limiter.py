@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Async token bucket allowing max_rate acquisitions per time_period.
+
+    The bucket starts full, so short bursts up to max_rate go through
+    immediately; after that callers wait until tokens refill.
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 60.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(
+            self.max_rate,
+            self._tokens + elapsed * self.max_rate / self.time_period,
+        )
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        # Holding the lock while sleeping keeps waiters in FIFO order.
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep(
+                    (1 - self._tokens) * self.time_period / self.max_rate
+                )
+                self._refill()
+            self._tokens -= 1
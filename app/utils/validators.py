@@ -1,7 +1,11 @@
+import re
+
 from pydantic import BaseModel, validator, ValidationError
 
 
 class Validators:
+    _EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
     @staticmethod
     def validate_length(value: str, min_length: int = 3, max_length: int = 100) -> str:
         """Validate that the length of a string is within the specified range."""
@@ -14,13 +18,13 @@ class Validators:
     @staticmethod
     def validate_non_empty(value: str) -> str:
         """Validate that a string is not empty or whitespace."""
-        if not value.strip():
+        if not value or value.isspace():
             raise ValueError("Value cannot be empty or whitespace.")
         return value
 
     @staticmethod
     def validate_email(value: str) -> str:
         """Validate that a string is a valid email address."""
-        if "@" not in value or "." not in value.split("@")[-1]:
+        if not Validators._EMAIL_RE.fullmatch(value):
             raise ValueError("Invalid email address.")
         return value